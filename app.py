@@ -1,9 +1,13 @@
 import streamlit as st
 import pandas as pd
 import re
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
 from io import BytesIO
 import subprocess
 import sys
+import xlsxwriter
 
 # Configuración de la página
 st.set_page_config(
@@ -19,11 +23,20 @@ Esta aplicación identifica y analiza todas las formas verbales en modo subjunti
 en textos en español usando métodos optimizados para el español.
 """)
 
+@st.cache_resource(show_spinner=False)
+def cargar_pattern():
+    """Importa pattern.es una sola vez por proceso; devuelve None si no está instalado"""
+    try:
+        import pattern.es
+    except ImportError:
+        return None
+    return pattern.es
+
 # Intentar instalar e importar pattern.es
-try:
-    from pattern.es import conjugate, lemma, lexeme, tenses, INFINITIVE
+pattern_es = cargar_pattern()
+if pattern_es is not None:
     st.session_state.pattern_available = True
-except ImportError:
+else:
     st.session_state.pattern_available = False
     st.warning("""
     ⚠️ La biblioteca Pattern no está instalada. 
@@ -36,42 +49,45 @@ except ImportError:
             try:
                 # Instalar pattern-es
                 subprocess.check_call([sys.executable, "-m", "pip", "install", "pattern-es"])
+                # Olvidar el intento de importación fallido para que el próximo run lo repita
+                cargar_pattern.clear()
                 st.success("✅ Pattern.es instalado correctamente. Por favor, recarga la página.")
                 st.rerun()
             except Exception as e:
                 st.error(f"❌ Error instalando Pattern.es: {str(e)}")
 
-# Verbos irregulares comunes en subjuntivo
-verbos_irregulares_subjuntivo = [
-    'sea', 'seas', 'seamos', 'sean',  # ser
-    'vaya', 'vayas', 'vayamos', 'vayan',  # ir
-    'haya', 'hayas', 'hayamos', 'hayan',  # haber
-    'esté', 'estés', 'estemos', 'estén',  # estar
-    'dé', 'des', 'demos', 'den',  # dar
-    'sepa', 'sepas', 'sepamos', 'sepan',  # saber
-    'quepa', 'quepas', 'quepamos', 'quepan',  # caber
-    'haga', 'hagas', 'hagamos', 'hagan',  # hacer
-    'pueda', 'puedas', 'podamos', 'puedan',  # poder
-    'quiera', 'quieras', 'queramos', 'quieran',  # querer
-    'tenga', 'tengas', 'tengamos', 'tengan',  # tener
-    'venga', 'vengas', 'vengamos', 'vengan',  # venir
-    'digas', 'diga', 'digamos', 'digan',  # decir
-    'oyas', 'oiga', 'oigamos', 'oigan',  # oír
-    'caiga', 'caigas', 'caigamos', 'caigan',  # caer
-    'traiga', 'traigas', 'traigamos', 'traigan',  # traer
-    'valga', 'valgas', 'valgamos', 'valgan',  # valer
-    'salga', 'salgas', 'salgamos', 'salgan',  # salir
-    'duerma', 'duermas', 'durmamos', 'duerman',  # dormir
-    'muera', 'mueras', 'muramos', 'mueran',  # morir
-    'sienta', 'sientas', 'sintamos', 'sientan',  # sentir
-    'pida', 'pidas', 'pidamos', 'pidan',  # pedir
-    'cuente', 'cuentes', 'contemos', 'cuenten',  # contar
-    'vuelva', 'vuelvas', 'volvamos', 'vuelvan',  # volver
-    'encuentre', 'encuentres', 'encontremos', 'encuentren'  # encontrar
-]
+# Verbos irregulares comunes en subjuntivo, con su infinitivo
+lemas_irregulares = {
+    'sea': 'ser', 'seas': 'ser', 'seamos': 'ser', 'sean': 'ser',
+    'vaya': 'ir', 'vayas': 'ir', 'vayamos': 'ir', 'vayan': 'ir',
+    'haya': 'haber', 'hayas': 'haber', 'hayamos': 'haber', 'hayan': 'haber',
+    'esté': 'estar', 'estés': 'estar', 'estemos': 'estar', 'estén': 'estar',
+    'dé': 'dar', 'des': 'dar', 'demos': 'dar', 'den': 'dar',
+    'sepa': 'saber', 'sepas': 'saber', 'sepamos': 'saber', 'sepan': 'saber',
+    'quepa': 'caber', 'quepas': 'caber', 'quepamos': 'caber', 'quepan': 'caber',
+    'haga': 'hacer', 'hagas': 'hacer', 'hagamos': 'hacer', 'hagan': 'hacer',
+    'pueda': 'poder', 'puedas': 'poder', 'podamos': 'poder', 'puedan': 'poder',
+    'quiera': 'querer', 'quieras': 'querer', 'queramos': 'querer', 'quieran': 'querer',
+    'tenga': 'tener', 'tengas': 'tener', 'tengamos': 'tener', 'tengan': 'tener',
+    'venga': 'venir', 'vengas': 'venir', 'vengamos': 'venir', 'vengan': 'venir',
+    'digas': 'decir', 'diga': 'decir', 'digamos': 'decir', 'digan': 'decir',
+    'oyas': 'oír', 'oiga': 'oír', 'oigamos': 'oír', 'oigan': 'oír',
+    'caiga': 'caer', 'caigas': 'caer', 'caigamos': 'caer', 'caigan': 'caer',
+    'traiga': 'traer', 'traigas': 'traer', 'traigamos': 'traer', 'traigan': 'traer',
+    'valga': 'valer', 'valgas': 'valer', 'valgamos': 'valer', 'valgan': 'valer',
+    'salga': 'salir', 'salgas': 'salir', 'salgamos': 'salir', 'salgan': 'salir',
+    'duerma': 'dormir', 'duermas': 'dormir', 'durmamos': 'dormir', 'duerman': 'dormir',
+    'muera': 'morir', 'mueras': 'morir', 'muramos': 'morir', 'mueran': 'morir',
+    'sienta': 'sentir', 'sientas': 'sentir', 'sintamos': 'sentir', 'sientan': 'sentir',
+    'pida': 'pedir', 'pidas': 'pedir', 'pidamos': 'pedir', 'pidan': 'pedir',
+    'cuente': 'contar', 'cuentes': 'contar', 'contemos': 'contar', 'cuenten': 'contar',
+    'vuelva': 'volver', 'vuelvas': 'volver', 'volvamos': 'volver', 'vuelvan': 'volver',
+    'encuentre': 'encontrar', 'encuentres': 'encontrar', 'encontremos': 'encontrar', 'encuentren': 'encontrar'
+}
+verbos_irregulares_subjuntivo = frozenset(lemas_irregulares)
 
 # Conectores que suelen introducir subjuntivo
-conectores_subjuntivo = [
+conectores_subjuntivo = (
     'que', 'cuando', 'si', 'aunque', 'para que', 'a fin de que', 
     'como si', 'a menos que', 'con tal de que', 'en caso de que',
     'sin que', 'antes de que', 'ojalá', 'espero que', 'dudo que',
@@ -79,7 +95,23 @@ conectores_subjuntivo = [
     'tal vez', 'a no ser que', 'salvo que', 'excepto que',
     'mientras', 'después de que', 'hasta que', 'en cuanto',
     'siempre que', 'por más que', 'a pesar de que'
-]
+)
+
+# Expresiones regulares precompiladas
+_NO_PALABRA_RE = re.compile(r'[^\w]')
+_PALABRA_RE = re.compile(r'\b[a-záéíóúñ]+\b', re.IGNORECASE)
+# Una oración: desde el primer carácter visible hasta el siguiente signo de fin
+_ORACION_RE = re.compile(r'[^.!?\s][^.!?]*')
+
+# Todos los conectores como palabras completas; los más largos primero para que
+# 'espero que' se reconozca entero en lugar de solo 'que'
+_CONECTORES_RE = re.compile(
+    r'\b(?:' + '|'.join(re.escape(conector) for conector in sorted(conectores_subjuntivo, key=len, reverse=True)) + r')\b',
+    re.IGNORECASE
+)
+
+# Signos que cierran una cláusula
+_SIGNOS_CIERRE_RE = re.compile(r'[.!?;]')
 
 # Lista de terminaciones de verbos en subjuntivo
 subjuntivo_terminaciones = [
@@ -95,11 +127,87 @@ subjuntivo_terminaciones = [
     'se', 'ses', 'semos', 'sen'  # Otra variante
 ]
 
-def es_verbo_subjuntivo(palabra):
-    """Determina si una palabra es un verbo en subjuntivo usando pattern.es si está disponible"""
-    palabra_limpia = re.sub(r'[^\w]', '', palabra.lower())
+# Tuplas de terminaciones para str.endswith (una sola llamada en C por prueba),
+# sin duplicados y de la más larga a la más corta
+_TERMINACIONES_SUBJUNTIVO = tuple(sorted(set(subjuntivo_terminaciones), key=len, reverse=True))
+# Última letra posible de cualquier forma en subjuntivo (a, e, s, n, é)
+_FINALES_SUBJUNTIVO = frozenset(
+    forma[-1] for forma in (*subjuntivo_terminaciones, *verbos_irregulares_subjuntivo)
+)
+# Las terminaciones de arriba ya aceptan todo lo que acaba en a, e, as, es, an o en;
+# de lo que queda, solo la 2.ª persona del plural (-áis, -éis) puede ser subjuntivo
+_TERM_SOLO_PATTERN = ('áis', 'éis', 'ais', 'eis')
+_TERM_PRESENTE = ('a', 'as', 'amos', 'áis', 'an', 'e', 'es', 'emos', 'éis', 'en')
+_TERM_IMPERFECTO = (
+    'ara', 'aras', 'áramos', 'arais', 'aran', 'iera', 'ieras', 'iéramos', 'ierais', 'ieran',
+    'era', 'eras', 'éramos', 'eran', 'iese', 'ieses', 'iésemos', 'ieseis', 'iesen',
+    'ase', 'ases', 'ásemos', 'aseis', 'asen', 'uese', 'ueses', 'uésemos', 'ueseis', 'uesen',
+    'jese', 'jeses', 'jésemos', 'jeseis', 'jesen'
+)
+_TERM_FUTURO = (
+    'are', 'ares', 'áremos', 'areis', 'aren', 'iere', 'ieres', 'iéremos', 'iereis', 'ieren'
+)
+
+# Terminación -> persona y número. En subjuntivo la 1ra y la 3ra del singular coinciden
+_PERSONA_POR_TERMINACION = {
+    'o': '1ra persona singular',
+    'a': '1ra/3ra persona singular', 'e': '1ra/3ra persona singular', 'é': '1ra/3ra persona singular',
+    'as': '2da persona singular', 'es': '2da persona singular', 'és': '2da persona singular',
+    'amos': '1ra persona plural', 'emos': '1ra persona plural', 'imos': '1ra persona plural',
+    'áis': '2da persona plural', 'éis': '2da persona plural', 'ís': '2da persona plural',
+    'ais': '2da persona plural', 'eis': '2da persona plural',
+    'an': '3ra persona plural', 'en': '3ra persona plural', 'én': '3ra persona plural'
+}
+_LONGITUDES_PERSONA = sorted({len(terminacion) for terminacion in _PERSONA_POR_TERMINACION}, reverse=True)
+
+# Terminación del subjuntivo -> terminación del infinitivo, de la más larga a la más corta.
+# Las formas de -er y de -ir coinciden; en ese caso se asume -er. En -uese y -jese
+# (fuese, dijese) la u y la j son de la raíz, así que se conservan.
+_TERMINACIONES_INFINITIVO = tuple(sorted((
+    ('e', 'ar'), ('es', 'ar'), ('emos', 'ar'), ('éis', 'ar'), ('en', 'ar'),
+    ('ara', 'ar'), ('aras', 'ar'), ('áramos', 'ar'), ('arais', 'ar'), ('aran', 'ar'),
+    ('ase', 'ar'), ('ases', 'ar'), ('ásemos', 'ar'), ('aseis', 'ar'), ('asen', 'ar'),
+    ('are', 'ar'), ('ares', 'ar'), ('áremos', 'ar'), ('areis', 'ar'), ('aren', 'ar'),
+    ('a', 'er'), ('as', 'er'), ('amos', 'er'), ('áis', 'er'), ('an', 'er'),
+    ('iera', 'er'), ('ieras', 'er'), ('iéramos', 'er'), ('ierais', 'er'), ('ieran', 'er'),
+    ('iese', 'er'), ('ieses', 'er'), ('iésemos', 'er'), ('ieseis', 'er'), ('iesen', 'er'),
+    ('uese', 'uer'), ('ueses', 'uer'), ('uésemos', 'uer'), ('ueseis', 'uer'), ('uesen', 'uer'),
+    ('jese', 'jer'), ('jeses', 'jer'), ('jésemos', 'jer'), ('jeseis', 'jer'), ('jesen', 'jer'),
+    ('iere', 'er'), ('ieres', 'er'), ('iéremos', 'er'), ('iereis', 'er'), ('ieren', 'er'),
+), key=lambda par: len(par[0]), reverse=True))
+
+# Máximo de respuestas de pattern.es que se guardan en memoria para todo el proceso
+_MAX_CONSULTAS_PATTERN = 16384
+
+@st.cache_resource(show_spinner=False)
+def _memoria_pattern():
+    """Consulta a pattern.es con memoria acotada, compartida entre reruns y sesiones"""
+    modulo = cargar_pattern()
+    
+    # Solo se guardan las respuestas: si pattern falla, la excepción sale sin quedar en memoria
+    @lru_cache(maxsize=_MAX_CONSULTAS_PATTERN)
+    def consultar(funcion, palabra_limpia):
+        return getattr(modulo, funcion)(palabra_limpia)
     
-    if not palabra_limpia:
+    return consultar
+
+def _consultar_pattern(funcion, palabra_limpia):
+    """Llama a pattern.es ('tenses' o 'lemma') una sola vez por palabra mientras siga en memoria"""
+    try:
+        return _memoria_pattern()(funcion, palabra_limpia)
+    except:
+        # Si pattern falla, continuar con otros métodos; se reintentará en la próxima consulta
+        return None
+
+def limpiar_palabra(palabra):
+    """Normaliza una palabra: minúsculas y sin caracteres que no sean de palabra"""
+    return _NO_PALABRA_RE.sub('', palabra.lower())
+
+@lru_cache(maxsize=8192)
+def _es_subjuntivo(palabra_limpia):
+    """Versión de es_verbo_subjuntivo para una palabra ya normalizada"""
+    # Descarte rápido: ninguna forma del subjuntivo termina en otra letra
+    if not palabra_limpia or palabra_limpia[-1] not in _FINALES_SUBJUNTIVO:
         return False
     
     # 1. Verificar verbos irregulares
@@ -107,207 +215,245 @@ def es_verbo_subjuntivo(palabra):
         return True
     
     # 2. Verificar por terminaciones típicas del subjuntivo
-    for terminacion in subjuntivo_terminaciones:
-        if palabra_limpia.endswith(terminacion):
-            return True
+    if palabra_limpia.endswith(_TERMINACIONES_SUBJUNTIVO):
+        return True
     
-    # 3. Usar pattern.es si está disponible para análisis más preciso
-    if st.session_state.pattern_available:
-        try:
-            # Obtener todos los tiempos verbales de esta forma
-            tiempos_verbales = tenses(palabra_limpia)
-            for tiempo in tiempos_verbales:
-                # El modo subjuntivo se representa como 'subjunctive' en pattern
-                if 'subjunctive' in str(tiempo).lower():
-                    return True
-        except:
-            # Si pattern falla, continuar con otros métodos
-            pass
+    # 3. Usar pattern.es si está disponible para análisis más preciso,
+    # solo con las formas que las terminaciones no han podido decidir
+    if pattern_es is not None and palabra_limpia.endswith(_TERM_SOLO_PATTERN):
+        # Obtener todos los tiempos verbales de esta forma
+        tiempos_verbales = _consultar_pattern('tenses', palabra_limpia) or []
+        for tiempo in tiempos_verbales:
+            # El modo subjuntivo se representa como 'subjunctive' en pattern
+            if 'subjunctive' in str(tiempo).lower():
+                return True
     
     return False
 
-def obtener_lema_verbal(palabra):
-    """Obtiene el lema (infinitivo) de un verbo"""
-    palabra_limpia = re.sub(r'[^\w]', '', palabra.lower())
-    
-    # Diccionario de verbos irregulares
-    verbos_irregulares = {
-        'sea': 'ser', 'seas': 'ser', 'seamos': 'ser', 'sean': 'ser',
-        'vaya': 'ir', 'vayas': 'ir', 'vayamos': 'ir', 'vayan': 'ir',
-        'haya': 'haber', 'hayas': 'haber', 'hayamos': 'haber', 'hayan': 'haber',
-        'esté': 'estar', 'estés': 'estar', 'estemos': 'estar', 'estén': 'estar',
-        'dé': 'dar', 'des': 'dar', 'demos': 'dar', 'den': 'dar',
-        'sepa': 'saber', 'sepas': 'saber', 'sepamos': 'saber', 'sepan': 'saber',
-        'haga': 'hacer', 'hagas': 'hacer', 'hagamos': 'hacer', 'hagan': 'hacer',
-        'pueda': 'poder', 'puedas': 'poder', 'podamos': 'poder', 'puedan': 'poder',
-        'quiera': 'querer', 'quieras': 'querer', 'queramos': 'querer', 'quieran': 'querer',
-        'tenga': 'tener', 'tengas': 'tener', 'tengamos': 'tener', 'tengan': 'tener',
-        'venga': 'venir', 'vengas': 'venir', 'vengamos': 'venir', 'vengan': 'venir'
-    }
-    
-    if palabra_limpia in verbos_irregulares:
-        return verbos_irregulares[palabra_limpia]
+@lru_cache(maxsize=8192)
+def _lema_verbal(palabra_limpia):
+    """Versión de obtener_lema_verbal para una palabra ya normalizada"""
+    lema_irregular = lemas_irregulares.get(palabra_limpia)
+    if lema_irregular:
+        return lema_irregular
     
     # Usar pattern.es si está disponible
-    if st.session_state.pattern_available:
-        try:
-            lema_verbo = lemma(palabra_limpia)
-            if lema_verbo and lema_verbo != palabra_limpia:
-                return lema_verbo
-        except:
-            pass
-    
-    # Método de respaldo: inferir el infinitivo desde la terminación
-    if palabra_limpia.endswith(('a', 'as', 'amos', 'an', 'ara', 'aras', 'áramos', 'aran', 'are', 'ares', 'áremos', 'aren')):
-        return palabra_limpia[:-2] + 'ar' if len(palabra_limpia) > 2 else palabra_limpia + 'ar'
-    elif palabra_limpia.endswith(('e', 'es', 'emos', 'en', 'era', 'eras', 'éramos', 'eran', 'ere', 'eres', 'éremos', 'eren')):
-        return palabra_limpia[:-2] + 'er' if len(palabra_limpia) > 2 else palabra_limpia + 'er'
-    elif palabra_limpia.endswith(('e', 'es', 'imos', 'en', 'iera', 'ieras', 'iéramos', 'ieran', 'iere', 'ieres', 'iéremos', 'ieren')):
-        return palabra_limpia[:-2] + 'ir' if len(palabra_limpia) > 2 else palabra_limpia + 'ir'
+    if pattern_es is not None:
+        lema_verbo = _consultar_pattern('lemma', palabra_limpia)
+        if lema_verbo and lema_verbo != palabra_limpia:
+            return lema_verbo
+    
+    # Método de respaldo: sustituir la terminación más larga por la del infinitivo
+    for terminacion, infinitivo in _TERMINACIONES_INFINITIVO:
+        if palabra_limpia.endswith(terminacion) and len(palabra_limpia) > len(terminacion):
+            return palabra_limpia[:-len(terminacion)] + infinitivo
     
     return palabra_limpia
 
-def determinar_tiempo_verbal(verbo):
-    """Determina el tiempo verbal aproximado"""
-    verbo_limpio = re.sub(r'[^\w]', '', verbo.lower())
-    
-    if any(verbo_limpio.endswith(t) for t in ['a', 'as', 'amos', 'an', 'e', 'es', 'emos', 'en']):
+@lru_cache(maxsize=8192)
+def _tiempo_verbal(verbo_limpio):
+    """Versión de determinar_tiempo_verbal para una palabra ya normalizada"""
+    # Las formas irregulares registradas son todas de presente
+    if verbo_limpio in verbos_irregulares_subjuntivo:
         return 'Presente'
-    elif any(verbo_limpio.endswith(t) for t in ['ara', 'aras', 'áramos', 'aran', 'iera', 'ieras', 'iéramos', 'ieran', 'era', 'eras', 'éramos', 'eran', 'ese', 'eses', 'ésemos', 'esen']):
+    
+    # Las terminaciones específicas van primero: 'ara' o 'iere' también acaban en 'a' o 'e'
+    if verbo_limpio.endswith(_TERM_IMPERFECTO):
         return 'Pretérito imperfecto'
-    elif any(verbo_limpio.endswith(t) for t in ['are', 'ares', 'áremos', 'aren', 'iere', 'ieres', 'iéremos', 'ieren']):
+    elif verbo_limpio.endswith(_TERM_FUTURO):
         return 'Futuro simple'
+    elif verbo_limpio.endswith(_TERM_PRESENTE):
+        return 'Presente'
     else:
         return 'Indeterminado'
 
+@lru_cache(maxsize=8192)
+def _persona(verbo_limpio):
+    """Versión de determinar_persona para una palabra ya normalizada"""
+    # La terminación más larga decide: 'amos' antes que 'as', 'as' antes que 'a'
+    for longitud in _LONGITUDES_PERSONA:
+        persona = _PERSONA_POR_TERMINACION.get(verbo_limpio[-longitud:])
+        if persona:
+            return persona
+    return 'Indeterminada'
+
+@lru_cache(maxsize=8192)
+def _clasificar_verbo(verbo_limpio):
+    """Lema, tiempo y persona de una palabra ya normalizada, con una sola consulta a la caché"""
+    return _lema_verbal(verbo_limpio), _tiempo_verbal(verbo_limpio), _persona(verbo_limpio)
+
+def es_verbo_subjuntivo(palabra):
+    """Determina si una palabra es un verbo en subjuntivo usando pattern.es si está disponible"""
+    return _es_subjuntivo(limpiar_palabra(palabra))
+
+def obtener_lema_verbal(palabra):
+    """Obtiene el lema (infinitivo) de un verbo"""
+    return _lema_verbal(limpiar_palabra(palabra))
+
+def determinar_tiempo_verbal(verbo):
+    """Determina el tiempo verbal aproximado"""
+    return _tiempo_verbal(limpiar_palabra(verbo))
+
 def determinar_persona(verbo):
     """Determina la persona y número del verbo"""
-    verbo_limpio = re.sub(r'[^\w]', '', verbo.lower())
-    
-    if verbo_limpio.endswith(('o', 'a', 'e')):  # 1ra singular
-        return '1ra persona singular'
-    elif verbo_limpio.endswith(('as', 'es')):  # 2da singular
-        return '2da persona singular'
-    elif verbo_limpio.endswith(('a', 'e')):  # 3ra singular
-        return '3ra persona singular'
-    elif verbo_limpio.endswith(('amos', 'emos', 'imos')):  # 1ra plural
-        return '1ra persona plural'
-    elif verbo_limpio.endswith(('áis', 'éis', 'ís')):  # 2da plural
-        return '2da persona plural'
-    elif verbo_limpio.endswith(('an', 'en')):  # 3ra plural
-        return '3ra persona plural'
-    else:
-        return 'Indeterminada'
+    return _persona(limpiar_palabra(verbo))
+
+def indexar_texto(texto):
+    """Precalcula las posiciones de conectores y signos de cierre del texto"""
+    # Inicio de cada conector, en orden, en una sola pasada sobre el texto
+    conectores = [match.start() for match in _CONECTORES_RE.finditer(texto)]
+    # Posiciones de todos los signos de cierre juntos, también en orden
+    cierres = [match.start() for match in _SIGNOS_CIERRE_RE.finditer(texto)]
+    return conectores, cierres
 
-def encontrar_clausula_subjuntivo(texto, posicion_verbo):
+def encontrar_clausula_subjuntivo(texto, posicion_verbo, indice=None):
     """Encuentra la cláusula que contiene el verbo en subjuntivo"""
-    # Buscar hacia atrás para encontrar el inicio de la cláusula
+    conectores, cierres = indice if indice is not None else indexar_texto(texto)
+    
+    # Primer signo de cierre a partir del verbo y último antes de él
+    i = bisect_left(cierres, posicion_verbo)
+    
+    # Buscar hacia atrás para encontrar el inicio de la cláusula, sin pasar
+    # del final de la oración anterior
     inicio = max(0, posicion_verbo - 100)  # Buscar hasta 100 caracteres atrás
+    if i > 0 and cierres[i - 1] >= inicio:
+        inicio = cierres[i - 1] + 1
     
-    for conector in conectores_subjuntivo:
-        idx = texto.rfind(conector, inicio, posicion_verbo)
-        if idx != -1:
-            inicio = idx
-            break
+    # Conector más cercano que empiece antes del verbo
+    j = bisect_left(conectores, posicion_verbo) - 1
+    if j >= 0 and conectores[j] >= inicio:
+        inicio = conectores[j]
     
     # Buscar hacia adelante para encontrar el final de la cláusula
     fin = min(len(texto), posicion_verbo + 100)  # Buscar hasta 100 caracteres adelante
-    
-    for puntuacion in ['.', '!', '?', ';']:
-        idx = texto.find(puntuacion, posicion_verbo)
-        if idx != -1 and idx < fin:
-            fin = idx + 1
-            break
+    if i < len(cierres) and cierres[i] < fin:
+        fin = cierres[i] + 1
     
     return texto[inicio:fin].strip()
 
-def analizar_texto(texto):
-    """Analiza el texto para identificar verbos en subjuntivo"""
-    # Usar una expresión regular para encontrar palabras (incluyendo acentos)
-    palabras = re.findall(r'\b[a-záéíóúñ]+\b', texto.lower())
-    posiciones = []
-    
-    # Encontrar todas las posiciones de las palabras
-    for match in re.finditer(r'\b[a-záéíóúñ]+\b', texto.lower()):
-        posiciones.append((match.group(), match.start()))
-    
-    resultados = []
-    
-    for palabra, posicion in posiciones:
-        if es_verbo_subjuntivo(palabra):
-            # Encontrar la cláusula
-            clausula = encontrar_clausula_subjuntivo(texto, posicion)
-            
-            # Determinar tiempo verbal aproximado
-            tiempo = determinar_tiempo_verbal(palabra)
+@st.cache_data(max_entries=32, show_spinner=False)
+def tokenizar_texto(texto):
+    """Devuelve las palabras del texto (en minúsculas) junto con su inicio y su fin"""
+    # Usar una expresión regular para encontrar palabras (incluyendo acentos);
+    # solo se pasa a minúsculas cada palabra, no una copia del texto completo.
+    # El fin se guarda aparte: al pasar a minúsculas la longitud puede cambiar (İ)
+    return [(match.group().lower(), match.start(), match.end()) for match in _PALABRA_RE.finditer(texto)]
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def calcular_estadisticas(texto, con_pattern):
+    """Cuenta las palabras, las oraciones y los verbos en subjuntivo aproximados del texto"""
+    # con_pattern solo forma parte de la clave de la caché: al instalar pattern.es
+    # los resultados cambian y no deben reutilizarse los calculados sin él
+    # Contar palabras (considerando acentos españoles)
+    palabras = tokenizar_texto(texto)
+    # Contar solo oraciones con contenido (el trozo vacío tras el punto final no cuenta)
+    total_oraciones = sum(1 for _ in _ORACION_RE.finditer(texto))
+    
+    # Contar verbos en subjuntivo aproximados, clasificando cada palabra distinta una sola vez
+    frecuencias = Counter(palabra for palabra, _, _ in palabras)
+    total_subjuntivo = sum(n for palabra, n in frecuencias.items() if _es_subjuntivo(palabra))
+    
+    return len(palabras), total_oraciones, total_subjuntivo
+
+# Límite propuesto cuando el usuario decide acotar el análisis de textos muy largos
+MAX_VERBOS_POR_DEFECTO = 500
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def analizar_texto(texto, con_pattern, max_verbos=None):
+    """Analiza el texto para identificar verbos en subjuntivo (como mucho max_verbos, si se indica)"""
+    # con_pattern solo forma parte de la clave de la caché (ver calcular_estadisticas)
+    posiciones = tokenizar_texto(texto)
+    indice = indexar_texto(texto)
+    
+    # Una lista por columna: pandas construye el DataFrame directamente a partir de ellas
+    verbos, lemas, tiempos, personas, clausulas, caracteres = [], [], [], [], [], []
+    truncado = False
+    # Varios verbos de una misma cláusula comparten un único objeto de texto
+    clausulas_vistas = {}
+    
+    # tokenizar_texto ya devuelve las palabras en minúsculas y sin signos,
+    # así que se clasifica cada palabra distinta una vez y luego basta con mirar el conjunto
+    subjuntivos = {palabra for palabra in {p for p, _, _ in posiciones} if _es_subjuntivo(palabra)}
+    for palabra_limpia, posicion, fin in posiciones:
+        if palabra_limpia in subjuntivos:
+            # En textos muy largos se corta el análisis al llegar al límite
+            if max_verbos is not None and len(verbos) >= max_verbos:
+                truncado = True
+                break
+            verbos.append(texto[posicion:fin])
             
-            # Determinar persona y número
-            persona = determinar_persona(palabra)
+            # Obtener lema (forma infinitiva), tiempo verbal aproximado y persona
+            lema_verbo, tiempo, persona = _clasificar_verbo(palabra_limpia)
+            lemas.append(lema_verbo)
+            tiempos.append(tiempo)
+            personas.append(persona)
             
-            # Obtener lema (forma infinitiva)
-            lema_verbo = obtener_lema_verbal(palabra)
+            # Encontrar la cláusula
+            clausula = encontrar_clausula_subjuntivo(texto, posicion, indice)
+            clausulas.append(clausulas_vistas.setdefault(clausula, clausula))
             
-            resultados.append({
-                'Verbo': texto[posicion:posicion+len(palabra)],
-                'Lema': lema_verbo,
-                'Tiempo': tiempo,
-                'Persona': persona,
-                'Cláusula': clausula,
-                'Posición': f"Carácter {posicion}"
-            })
-    
-    return resultados
+            caracteres.append(f"Carácter {posicion}")
+    
+    return {
+        'Verbo': verbos,
+        'Lema': lemas,
+        'Tiempo': tiempos,
+        'Persona': personas,
+        'Cláusula': clausulas,
+        'Posición': caracteres
+    }, truncado
 
+# Ancho máximo (en caracteres) de una columna del informe Excel
+_ANCHO_MAXIMO_EXCEL = 40
+
+@st.cache_data(max_entries=64, show_spinner=False)
 def crear_excel(resultados):
     """Crea un archivo Excel con los resultados"""
-    if not resultados:
+    if not resultados['Verbo']:
         return None
     
-    df = pd.DataFrame(resultados)
+    columnas = list(resultados)
     
-    # Crear el archivo Excel en memoria
+    # Crear el archivo Excel en memoria, volcando las filas a medida que se escriben
     output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, sheet_name='Subjuntivos', index=False)
-        
-        # Obtener el libro y la hoja de trabajo para aplicar formato
-        workbook = writer.book
-        worksheet = writer.sheets['Subjuntivos']
-        
-        # Formato para los encabezados
-        header_format = workbook.add_format({
-            'bold': True,
-            'text_wrap': True,
-            'valign': 'top',
-            'fg_color': '#366092',
-            'font_color': 'white',
-            'border': 1
-        })
-        
-        # Aplicar formato a los encabezados
-        for col_num, value in enumerate(df.columns.values):
-            worksheet.write(0, col_num, value, header_format)
-        
-        # Ajustar el ancho de las columnas
-        for i, col in enumerate(df.columns):
-            max_len = max(df[col].astype(str).map(len).max(), len(col)) + 2
-            worksheet.set_column(i, i, max_len)
-    
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    worksheet = workbook.add_worksheet('Subjuntivos')
+    
+    # Formato para los encabezados
+    header_format = workbook.add_format({
+        'bold': True,
+        'text_wrap': True,
+        'valign': 'top',
+        'fg_color': '#366092',
+        'font_color': 'white',
+        'border': 1
+    })
+    worksheet.write_row(0, 0, columnas, header_format)
+    
+    # Escribir las filas en orden
+    for fila, valores in enumerate(zip(*resultados.values()), start=1):
+        worksheet.write_row(fila, 0, valores)
+    
+    # Ajustar el ancho de las columnas, con un tope para las cláusulas largas
+    for i, (columna, valores) in enumerate(resultados.items()):
+        ancho = max(len(columna), *map(len, valores)) + 2
+        worksheet.set_column(i, i, min(ancho, _ANCHO_MAXIMO_EXCEL))
+    
+    workbook.close()
     output.seek(0)
     return output
 
-def crear_csv(resultados):
-    """Crea un archivo CSV con los resultados"""
-    if not resultados:
+@st.cache_data(max_entries=64, show_spinner=False)
+def crear_csv(df):
+    """Crea un archivo CSV a partir del DataFrame de resultados ya construido"""
+    if df.empty:
         return None
     
-    df = pd.DataFrame(resultados)
-    
     # Crear el archivo CSV en memoria
     output = BytesIO()
     
-    # Escribir el CSV con codificación UTF-8 para caracteres especiales
-    output.write(df.to_csv(index=False, encoding='utf-8').encode('utf-8'))
+    # Escribir el CSV con codificación UTF-8 directamente en el buffer
+    df.to_csv(output, index=False, encoding='utf-8')
     
     output.seek(0)
     return output
@@ -332,6 +478,18 @@ with st.sidebar:
         st.success("✅ Pattern.es está disponible para análisis avanzado")
     else:
         st.warning("⚠️ Usando método alternativo (Pattern.es no disponible)")
+    
+    # Por defecto se analiza el texto completo: la tabla y los informes muestran todas las filas
+    if st.checkbox("Limitar los verbos analizados", value=False):
+        max_verbos = st.number_input(
+            "Máx. verbos a analizar",
+            min_value=100,
+            max_value=10000,
+            value=MAX_VERBOS_POR_DEFECTO,
+            step=100
+        )
+    else:
+        max_verbos = None
 
 # Área de texto para entrada
 col1, col2 = st.columns([2, 1])
@@ -346,17 +504,11 @@ with col1:
 with col2:
     st.markdown("### 📊 Estadísticas")
     if texto:
-        # Contar palabras (considerando acentos españoles)
-        palabras = re.findall(r'\b[a-záéíóúñ]+\b', texto.lower())
-        total_palabras = len(palabras)
-        total_oraciones = len(re.split(r'[.!?]+', texto))
+        total_palabras, total_oraciones, total_subjuntivo = calcular_estadisticas(texto, pattern_es is not None)
         
         st.metric("Palabras", total_palabras)
         st.metric("Oraciones", total_oraciones)
-        
-        # Contar verbos en subjuntivo aproximados
-        verbos_subjuntivo = [p for p in palabras if es_verbo_subjuntivo(p)]
-        st.metric("Verbos subjuntivo", len(verbos_subjuntivo))
+        st.metric("Verbos subjuntivo", total_subjuntivo)
     else:
         st.info("Introduce texto para ver estadísticas")
 
@@ -366,14 +518,24 @@ if st.button("🔍 Analizar Subjuntivo", type="primary"):
         st.warning("Por favor, introduce un texto para analizar.")
     else:
         with st.spinner("Analizando texto..."):
-            resultados = analizar_texto(texto)
+            resultados, truncado = analizar_texto(texto, pattern_es is not None, max_verbos)
         
-        if resultados:
-            st.success(f"✅ Se encontraron {len(resultados)} verbos en subjuntivo")
+        total_subjuntivos = len(resultados['Verbo'])
+        if total_subjuntivos:
+            # Si se alcanzó el límite, hay al menos un verbo más sin analizar
+            total_mostrado = f"{total_subjuntivos}+" if truncado else total_subjuntivos
+            st.success(f"✅ Se encontraron {total_mostrado} verbos en subjuntivo")
+            if truncado:
+                st.info(f"ℹ️ Se muestran solo los primeros {total_subjuntivos}; aumenta o quita el límite en la barra lateral para analizar más. Los informes descargados también son parciales.")
+            
+            # Los informes de un análisis truncado se marcan como parciales en el nombre
+            nombre_informe = "analisis_subjuntivo_parcial" if truncado else "analisis_subjuntivo"
             
             # Mostrar resultados en tabla
             st.subheader("📋 Resultados del Análisis")
-            df = pd.DataFrame(resultados)
+            # Tiempo y Persona tienen pocos valores distintos: como categorías, los
+            # recuentos de más abajo trabajan sobre códigos enteros
+            df = pd.DataFrame(resultados).astype({'Tiempo': 'category', 'Persona': 'category'})
             st.dataframe(df, use_container_width=True)
             
             # Crear columnas para los botones de descarga
@@ -386,19 +548,19 @@ if st.button("🔍 Analizar Subjuntivo", type="primary"):
                 st.download_button(
                     label="📥 Descargar Informe Excel",
                     data=excel_file,
-                    file_name="analisis_subjuntivo.xlsx",
+                    file_name=f"{nombre_informe}.xlsx",
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                     use_container_width=True
                 )
             
             with col_download2:
                 # Generar y descargar CSV
-                csv_file = crear_csv(resultados)
+                csv_file = crear_csv(df)
                 
                 st.download_button(
                     label="📄 Descargar Informe CSV",
                     data=csv_file,
-                    file_name="analisis_subjuntivo.csv",
+                    file_name=f"{nombre_informe}.csv",
                     mime="text/csv",
                     use_container_width=True
                 )
@@ -406,7 +568,7 @@ if st.button("🔍 Analizar Subjuntivo", type="primary"):
             # Mostrar estadísticas
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("Total subjuntivos", len(resultados))
+                st.metric("Total subjuntivos", total_mostrado)
             with col2:
                 tiempos = df['Tiempo'].value_counts()
                 st.metric("Tiempo más común", tiempos.index[0] if len(tiempos) > 0 else "N/A")